@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import time
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared HTTP client for the Streamlit front ends talking to the movie API
+
+API_URL = os.environ.get("MOVIES_API_URL", "http://localhost:8000")
+CONNECT_TIMEOUT = float(os.environ.get("MOVIES_API_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("MOVIES_API_READ_TIMEOUT", "10"))
+MAX_RETRIES = int(os.environ.get("MOVIES_API_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.environ.get("MOVIES_API_BACKOFF", "0.3"))
+
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource
+def get_session():
+    """One pooled keep-alive session per server process, reused across reruns."""
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(502, 503, 504),
+        # Only idempotent calls are retried once the request has been sent;
+        # connection failures are retried for every method
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=16)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+
+def request(method, path, **kwargs):
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    start = time.perf_counter()
+    try:
+        res = get_session().request(method, f"{API_URL}{path}", **kwargs)
+    except requests.RequestException as e:
+        elapsed = (time.perf_counter() - start) * 1000
+        logger.warning("%s %s failed after %.1f ms: %s", method, path, elapsed, e)
+        raise
+    elapsed = (time.perf_counter() - start) * 1000
+    logger.info("%s %s -> %s in %.1f ms", method, path, res.status_code, elapsed)
+    return res
+
+
+def get(path, **kwargs):
+    return request("GET", path, **kwargs)
+
+
+def post(path, **kwargs):
+    return request("POST", path, **kwargs)
+
+
+def iter_changes(last_event_id=None, **kwargs):
+    """Yield (event id, movie) pairs from GET /movies/changes, resuming after last_event_id.
+
+    Blocks between events; the server's keepalives arrive well inside the
+    read timeout, so a stalled connection still raises.
+    """
+    headers = kwargs.pop("headers", {})
+    if last_event_id is not None:
+        headers["Last-Event-ID"] = str(last_event_id)
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, max(READ_TIMEOUT, 30)))
+    with request("GET", "/movies/changes", headers=headers, stream=True, **kwargs) as res:
+        res.raise_for_status()
+        event_id, data = None, []
+        for line in res.iter_lines(decode_unicode=True):
+            if line:
+                field, _, value = line.partition(":")
+                value = value.removeprefix(" ")
+                if field == "id":
+                    event_id = value
+                elif field == "data":
+                    data.append(value)
+            elif data:
+                # A blank line ends the event
+                yield int(event_id), json.loads("\n".join(data))
+                event_id, data = None, []
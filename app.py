@@ -1,75 +1,185 @@
-import streamlit as st
-import requests
-
-st.set_page_config(page_title="🎬 Movie Tracker", layout="wide")
-
-API_URL = "http://localhost:8000"
-
-st.title("🎬 My Movie Tracker")
-
-# Sidebar filters
-st.sidebar.header("Filter Movies")
-
-# Genre filter
-genres = ["All", "Action", "Comedy", "Drama", "Horror", "Sci-Fi", "Thriller", "Musical", "Other"]
-selected_genre = st.sidebar.selectbox("Select Genre", genres)
-
-# Minimum rating filter
-selected_rating = st.sidebar.slider("Minimum Rating", 1, 5, 1)
-
-# Release year range filter
-min_year = 1900
-max_year = 2100
-selected_year_range = st.sidebar.slider("Release Year Range", min_year, max_year, (2000, 2025))
-
-# Fetch movies from backend
-movies = requests.get(f"{API_URL}/movies/").json()
-
-# Apply filters
-if selected_genre != "All":
-    movies = [m for m in movies if m['genre'] == selected_genre]
-
-movies = [m for m in movies if m['rating'] >= selected_rating]
-
-movies = [m for m in movies if selected_year_range[0] <= m['year'] <= selected_year_range[1]]
-
-# Main area: add movie form
-st.header("➕ Add a New Movie")
-
-with st.form("add_movie"):
-    title = st.text_input("Movie Title")
-    director = st.text_input("Director")
-    year = st.number_input("Release Year", min_value=min_year, max_value=max_year, value=2023)
-    genre = st.selectbox("Genre", genres[1:])  # exclude 'All'
-    rating = st.slider("Rating (1-5)", 1, 5)
-    submitted = st.form_submit_button("Add Movie")
-
-    if submitted:
-        res = requests.post(f"{API_URL}/movies/", json={
-            "title": title,
-            "director": director,
-            "year": year,
-            "genre": genre,
-            "rating": rating
-        })
-        if res.status_code == 200:
-            st.success("✅ Movie added!")
-        else:
-            st.error(f"❌ Error: {res.json().get('detail', 'Unknown error')}")
-
-st.divider()
-
-# Display filtered movies
-st.header("📽️ Movie List")
-
-if not movies:
-    st.info("No movies match the filters.")
-else:
-    for movie in movies:
-        stars = "⭐" * movie['rating']
-        st.markdown(f"""
-        - **{movie['title']}** ({movie['year']})  
-        🎬 Directed by: *{movie['director']}*  
-        🎭 Genre: `{movie['genre']}`  
-        ⭐ Rating: {stars}
-        """)
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+import requests
+
+import api_client
+
+st.set_page_config(page_title="🎬 Movie Tracker", layout="wide")
+
+st.title("🎬 My Movie Tracker")
+
+# How long fetched API data is reused before revalidating with the API
+CACHE_TTL_SECONDS = 30
+# Revalidation entries kept across all sessions, least recently used dropped first
+ETAG_STORE_SIZE = 256
+
+@st.cache_resource
+def _etag_store():
+    # Last ETag, payload and headers per request, shared across sessions
+    return OrderedDict(), threading.Lock()
+
+def _get_json(path, params=()):
+    """GET with If-None-Match revalidation; returns the JSON body and the headers."""
+    store, lock = _etag_store()
+    key = (path, params)
+    with lock:
+        cached = store.get(key)
+        if cached is not None:
+            store.move_to_end(key)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    res = api_client.get(path, params=dict(params), headers=headers)
+    if res.status_code == 304 and cached:
+        return cached[1], cached[2]
+    res.raise_for_status()
+    body = res.json()
+    if "ETag" in res.headers:
+        with lock:
+            store[key] = (res.headers["ETag"], body, res.headers)
+            store.move_to_end(key)
+            while len(store) > ETAG_STORE_SIZE:
+                store.popitem(last=False)
+    return body, res.headers
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def fetch_movies(params):
+    """Fetch one page of movies; returns the rows and the cursor of the next page."""
+    movies, headers = _get_json("/movies/", params)
+    return movies, headers.get("X-Next-Cursor")
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def fetch_facets():
+    """Genres, year bounds and rating histogram of the movies actually stored."""
+    return _get_json("/movies/facets")[0]
+
+# Genres offered when adding a movie
+genres = ["Action", "Comedy", "Drama", "Horror", "Sci-Fi", "Thriller", "Musical", "Other"]
+
+# Years accepted when adding a movie
+min_year = 1900
+max_year = 2100
+
+try:
+    facets = fetch_facets()
+except requests.RequestException as e:
+    st.sidebar.error(f"❌ Could not load filters: {e}")
+    facets = {"genres": [], "year_min": None, "year_max": None}
+
+# Sidebar filters, built from the values present in the catalog
+st.sidebar.header("Filter Movies")
+
+# Genre filter
+genre_counts = {facet["genre"]: facet["count"] for facet in facets["genres"]}
+selected_genre = st.sidebar.selectbox(
+    "Select Genre",
+    ["All"] + sorted(genre_counts),
+    format_func=lambda g: g if g == "All" else f"{g} ({genre_counts[g]})",
+)
+
+# Minimum rating filter
+selected_rating = st.sidebar.slider("Minimum Rating", 1, 5, 1)
+
+# Release year range filter
+year_low = facets["year_min"] if facets["year_min"] is not None else min_year
+year_high = facets["year_max"] if facets["year_max"] is not None else max_year
+year_high = max(year_high, year_low + 1)  # the slider needs a non-empty range
+selected_year_range = st.sidebar.slider("Release Year Range", year_low, year_high, (year_low, year_high))
+
+# Main area: add movie form
+st.header("➕ Add a New Movie")
+
+with st.form("add_movie"):
+    title = st.text_input("Movie Title")
+    director = st.text_input("Director")
+    year = st.number_input("Release Year", min_value=min_year, max_value=max_year, value=2023)
+    genre = st.selectbox("Genre", sorted(set(genres) | set(genre_counts)))
+    rating = st.slider("Rating (1-5)", 1, 5)
+    submitted = st.form_submit_button("Add Movie")
+
+    if submitted:
+        try:
+            res = api_client.post("/movies/", json={
+                "title": title,
+                "director": director,
+                "year": year,
+                "genre": genre,
+                "rating": rating
+            })
+        except requests.RequestException as e:
+            st.error(f"❌ Could not reach the API: {e}")
+        else:
+            if res.status_code == 200:
+                fetch_movies.clear()
+                fetch_facets.clear()
+                st.success("✅ Movie added!")
+            else:
+                st.error(f"❌ Error: {res.json().get('detail', 'Unknown error')}")
+
+st.divider()
+
+# Display filtered movies
+st.header("📽️ Movie List")
+
+sort_options = {"id": "Date added", "year": "Release year", "rating": "Rating"}
+col_sort, col_order, col_size = st.columns(3)
+sort = col_sort.selectbox("Sort by", list(sort_options), format_func=sort_options.get)
+order = col_order.selectbox("Order", ["desc", "asc"], format_func={"asc": "Ascending", "desc": "Descending"}.get)
+page_size = col_size.selectbox("Movies per page", [10, 25, 50, 100], index=1)
+
+# Fetch only the visible page from the backend, letting the API apply the filters.
+# Done after the form so a movie added in this run is already listed.
+params = {
+    "min_rating": selected_rating,
+    "year_from": selected_year_range[0],
+    "year_to": selected_year_range[1],
+    "sort": sort,
+    "order": order,
+    "limit": page_size,
+}
+if selected_genre != "All":
+    params["genre"] = selected_genre
+
+# Cursors of the pages visited so far; start over whenever the query changes
+query_key = tuple(sorted(params.items()))
+if st.session_state.get("page_query") != query_key:
+    st.session_state.page_query = query_key
+    st.session_state.page_cursors = [None]
+cursors = st.session_state.page_cursors
+if cursors[-1] is not None:
+    params["cursor"] = cursors[-1]
+
+try:
+    movies, next_cursor = fetch_movies(tuple(sorted(params.items())))
+except requests.RequestException as e:
+    st.error(f"❌ Could not load movies: {e}")
+    movies, next_cursor = [], None
+
+if not movies:
+    st.info("No movies match the filters.")
+else:
+    # One dataframe per page instead of one markdown block per movie
+    st.dataframe(
+        [
+            {
+                "Title": movie["title"],
+                "Year": movie["year"],
+                "Director": movie["director"],
+                "Genre": movie["genre"],
+                "Rating": "⭐" * movie["rating"],
+            }
+            for movie in movies
+        ],
+        hide_index=True,
+        width="stretch",
+        column_config={"Year": st.column_config.NumberColumn(format="%d")},
+    )
+
+col_prev, col_page, col_next = st.columns([1, 2, 1])
+if col_prev.button("⬅️ Previous", disabled=len(cursors) == 1):
+    cursors.pop()
+    st.rerun()
+col_page.caption(f"Page {len(cursors)}")
+if col_next.button("Next ➡️", disabled=next_cursor is None):
+    cursors.append(next_cursor)
+    st.rerun()
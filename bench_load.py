@@ -0,0 +1,263 @@
+"""Load-test the movie API end to end.
+
+Starts main.py under uvicorn against a temporary SQLite file, seeds it with
+synthetic movies, then drives a mix of GET /movies/ and POST /movies/ from
+many concurrent asyncio clients and reports throughput and latency
+percentiles. Results are written as JSON; pass a previous result file as
+--baseline to flag regressions.
+
+    python bench_load.py --movies 50000 --concurrency 32 --duration 20
+    python bench_load.py --env MOVIES_GROUP_COMMIT=1 --baseline bench.json
+    python bench_load.py --metrics-overhead
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+GENRES = ["Action", "Comedy", "Drama", "Horror", "Sci-Fi", "Thriller", "Musical", "Other"]
+SEED_CHUNK = 10_000
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def random_movie(i):
+    return {
+        "title": f"Movie {i}",
+        "director": f"Director {i % 997}",
+        "year": random.randint(1950, 2025),
+        "genre": random.choice(GENRES),
+        "rating": random.randint(1, 5),
+    }
+
+
+def random_query(page_size):
+    params = {"limit": page_size}
+    if random.random() < 0.5:
+        params["genre"] = random.choice(GENRES)
+    if random.random() < 0.5:
+        params["min_rating"] = random.randint(1, 5)
+    if random.random() < 0.3:
+        params["year_from"] = random.randint(1950, 2020)
+    return params
+
+
+def start_server(port, db_path, extra_env):
+    env = {**os.environ, **extra_env, "MOVIES_DB": db_path}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    )
+
+
+async def wait_ready(client, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            await client.get("/openapi.json")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start in time")
+
+
+async def seed(client, count):
+    for start in range(0, count, SEED_CHUNK):
+        body = "\n".join(json.dumps(random_movie(i)) for i in range(start, min(start + SEED_CHUNK, count)))
+        res = await client.post("/movies/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+        res.raise_for_status()
+
+
+async def run_client(client, deadline, args, samples, counter):
+    while time.monotonic() < deadline:
+        if args.requests and counter[0] >= args.requests:
+            return
+        counter[0] += 1
+        if random.random() < args.read_ratio:
+            op = "GET /movies/"
+            call = client.get("/movies/", params=random_query(args.page_size))
+        else:
+            op = "POST /movies/"
+            call = client.post("/movies/", json=random_movie(random.randrange(1 << 30)))
+        start = time.perf_counter()
+        try:
+            res = await call
+            ok = res.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        samples.setdefault(op, []).append((time.perf_counter() - start, ok))
+
+
+def summarize(samples, elapsed):
+    def stats(entries):
+        latencies = sorted(latency * 1000 for latency, _ in entries)
+        errors = sum(1 for _, ok in entries if not ok)
+        if len(latencies) > 1:
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = latencies[0] if latencies else 0.0
+        return {
+            "requests": len(entries),
+            "errors": errors,
+            "rps": round(len(entries) / elapsed, 1),
+            "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "p50_ms": round(p50, 2),
+            "p95_ms": round(p95, 2),
+            "p99_ms": round(p99, 2),
+        }
+
+    summary = {op: stats(entries) for op, entries in sorted(samples.items())}
+    summary["total"] = stats([entry for entries in samples.values() for entry in entries])
+    return summary
+
+
+def compare(current, baseline, tolerance):
+    """Print deltas against a previous run; returns True if anything regressed."""
+    regressed = False
+    for op, stats in current.items():
+        before = baseline.get(op)
+        if not before:
+            continue
+        rps_change = stats["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+        p95_change = stats["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        bad = rps_change < -tolerance or p95_change > tolerance
+        regressed |= bad
+        print(f"{op:<16} rps {rps_change:+.1%}  p95 {p95_change:+.1%}{'  REGRESSION' if bad else ''}")
+    return regressed
+
+
+async def bench(args, extra_env):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(port, os.path.join(tmp, "bench.db"), extra_env)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        try:
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=args.timeout
+            ) as client:
+                await wait_ready(client, server)
+                await seed(client, args.movies)
+
+                samples, counter = {}, [0]
+                start = time.monotonic()
+                deadline = start + args.duration
+                await asyncio.gather(*(
+                    run_client(client, deadline, args, samples, counter) for _ in range(args.concurrency)
+                ))
+                elapsed = time.monotonic() - start
+        finally:
+            server.terminate()
+            server.wait()
+
+    return {
+        "config": {
+            "movies": args.movies,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "requests": args.requests,
+            "read_ratio": args.read_ratio,
+            "page_size": args.page_size,
+            "env": extra_env,
+        },
+        "platform": {"python": platform.python_version(), "machine": platform.machine()},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "elapsed_s": round(elapsed, 2),
+        "results": summarize(samples, elapsed),
+    }
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=10_000, help="rows to seed before the run")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent asyncio clients")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to drive load")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = no cap)")
+    parser.add_argument("--read-ratio", type=float, default=0.9, help="share of GETs in the mix")
+    parser.add_argument("--page-size", type=int, default=50, help="limit used for GET /movies/")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout in seconds")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the server, e.g. MOVIES_FAST_JSON=1")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed regression before failing")
+    parser.add_argument("--metrics-overhead", action="store_true",
+                        help="run with MOVIES_METRICS off and on and check the instrumentation overhead")
+    parser.add_argument("--max-overhead", type=float, default=0.05,
+                        help="allowed throughput loss from instrumentation")
+    parser.add_argument("--overhead-rounds", type=int, default=3,
+                        help="alternating off/on runs for --metrics-overhead")
+    args = parser.parse_args()
+
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    if args.metrics_overhead:
+        sys.exit(check_metrics_overhead(args, extra_env))
+
+    report = asyncio.run(bench(args, extra_env))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_results(report["results"])
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if compare(report["results"], baseline, args.tolerance):
+            sys.exit(1)
+
+
+def print_results(results):
+    print(f"{'operation':<16} {'requests':>8} {'errors':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for op, stats in results.items():
+        print(
+            f"{op:<16} {stats['requests']:>8} {stats['errors']:>6} {stats['rps']:>8} "
+            f"{stats['p50_ms']:>6}ms {stats['p95_ms']:>6}ms {stats['p99_ms']:>6}ms"
+        )
+
+
+def check_metrics_overhead(args, extra_env):
+    """Run the same load with instrumentation off and on; returns an exit code.
+
+    Runs alternate between the two settings and the best run of each is
+    compared, which keeps machine noise from dominating a few-percent delta.
+    """
+    runs = {"0": [], "1": []}
+    for _ in range(args.overhead_rounds):
+        for enabled in runs:
+            report = asyncio.run(bench(args, {**extra_env, "MOVIES_METRICS": enabled}))
+            runs[enabled].append(report)
+            print(f"MOVIES_METRICS={enabled}")
+            print_results(report["results"])
+    with open(args.output, "w") as f:
+        json.dump({"metrics_off": runs["0"], "metrics_on": runs["1"]}, f, indent=2)
+
+    off, on = (
+        max((report["results"]["total"] for report in runs[enabled]), key=lambda total: total["rps"])
+        for enabled in ("0", "1")
+    )
+    rps_overhead = 1 - on["rps"] / off["rps"] if off["rps"] else 0.0
+    p50_overhead = on["p50_ms"] / off["p50_ms"] - 1 if off["p50_ms"] else 0.0
+    print(f"metrics overhead: rps {rps_overhead:+.1%}  p50 {p50_overhead:+.1%} (limit {args.max_overhead:.0%})")
+    return 1 if rps_overhead > args.max_overhead else 0
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,70 @@
+"""Compare list-response serialization paths used by GET /movies/.
+
+Times the default Pydantic path against the MOVIES_FAST_JSON fast path on
+rows read from a throwaway SQLite database.
+
+    python bench_serialization.py [--sizes 10000 100000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+# Point the API at a scratch database before main/database are imported
+os.environ["MOVIES_DB"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+import main  # noqa: E402
+from database import init_db, pool  # noqa: E402
+
+GENRES = ["Action", "Comedy", "Drama", "Horror", "Sci-Fi", "Thriller", "Musical", "Other"]
+
+
+def seed(conn, count):
+    conn.execute("DELETE FROM movies")
+    conn.executemany(
+        main.INSERT_MOVIE,
+        (
+            (f"Movie {i}", f"Director {i % 997}", random.randint(1950, 2025),
+             random.choice(GENRES), random.randint(1, 5))
+            for i in range(count)
+        ),
+    )
+    conn.commit()
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    init_db()
+    encoder = "orjson" if main.orjson is not None else "json"
+    print(f"fast path encoder: {encoder}")
+    print(f"{'rows':>8} {'pydantic':>10} {'fast':>10} {'speedup':>8}")
+    for size in args.sizes:
+        with pool.connection() as conn:
+            seed(conn, size)
+            rows = conn.execute(f"SELECT {main.MOVIE_SELECT} FROM movies ORDER BY id").fetchall()
+
+        main.FAST_JSON = False
+        slow, slow_body = best_of(args.repeat, main._serialize_movies, rows)
+        main.FAST_JSON = True
+        fast, fast_body = best_of(args.repeat, main._serialize_movies, rows)
+
+        assert main.movie_list.validate_json(slow_body) == main.movie_list.validate_json(fast_body)
+        print(f"{size:>8} {slow * 1000:>8.1f}ms {fast * 1000:>8.1f}ms {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run()
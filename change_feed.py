@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+from collections import deque
+
+# Sent when no event has gone out for this long, so proxies keep the stream open
+KEEPALIVE_SECONDS = 15.0
+# Client reconnect delay suggested in the stream, in milliseconds
+RETRY_MS = 3000
+
+# Columns of each event, in the order rows are read for it
+CHANGE_COLUMNS = ("id", "title", "director", "year", "genre", "rating")
+CHANGE_SELECT = f"SELECT {', '.join(CHANGE_COLUMNS)} FROM movies"
+
+
+def format_event(row, event="insert"):
+    payload = json.dumps(dict(zip(CHANGE_COLUMNS, row)), separators=(",", ":"))
+    return f"id: {row[0]}\nevent: {event}\ndata: {payload}\n\n".encode()
+
+
+class ChangeFeed:
+    """Broadcasts inserted movies to Server-Sent Events subscribers.
+
+    The sequence number of an event is the movie id, which AUTOINCREMENT
+    hands out in commit order. ``sync()`` is called after every committed
+    write and reads the rows past the last published id, so events always
+    go out in order no matter which thread committed first. Encoded events
+    are kept in a bounded ring buffer shared by all subscribers; a client
+    that resumes from further back than the buffer reaches is backfilled
+    from the database first.
+    """
+
+    def __init__(self, connect, backfill, buffer_size=1024, keepalive=KEEPALIVE_SECONDS):
+        self.connect = connect
+        # backfill(after, up_to, limit) -> CHANGE_COLUMNS rows with after < id <= up_to, in id order
+        self.backfill = backfill
+        self.keepalive = keepalive
+        self._buffer = deque(maxlen=buffer_size)
+        # Every event with a sequence above this is in the buffer
+        self._floor = 0
+        self._last_seq = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._loop = None
+        self._wakeup = None
+
+    def start(self, loop):
+        """Bind to the serving event loop; only changes committed from now on are buffered."""
+        with self._lock:
+            self._conn = self.connect()
+            self._last_seq = self._floor = self._conn.execute("SELECT IFNULL(MAX(id), 0) FROM movies").fetchone()[0]
+            self._buffer.clear()
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+
+    def stop(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._loop = None
+        # Anything still waiting should notice the shutdown promptly
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def last_seq(self):
+        return self._last_seq
+
+    def sync(self):
+        """Publish rows committed since the last sync; safe to call from any thread."""
+        with self._lock:
+            if self._conn is None:
+                return
+            # Only the newest rows that fit in the buffer are worth encoding; a
+            # large bulk insert would otherwise be read and formatted in full
+            # here, on the write path, just to be evicted again
+            maxlen = self._buffer.maxlen
+            rows = self._conn.execute(
+                f"{CHANGE_SELECT} WHERE id > ? ORDER BY id DESC LIMIT ?", (self._last_seq, maxlen)
+            ).fetchall()
+            if not rows:
+                return
+            rows.reverse()
+            if len(rows) == maxlen:
+                # Anything skipped is served by backfill from the table
+                self._buffer.clear()
+                self._floor = rows[0][0] - 1
+            for row in rows:
+                if len(self._buffer) == self._buffer.maxlen:
+                    self._floor = self._buffer[0][0]
+                self._buffer.append((row[0], format_event(row)))
+            self._last_seq = rows[-1][0]
+            loop = self._loop
+        loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        # Runs on the event loop: release every waiter, then arm a fresh event
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    def _buffered_after(self, seq):
+        """Encoded events newer than ``seq``, or None if the buffer no longer reaches back that far."""
+        events = []
+        with self._lock:
+            if seq < self._floor:
+                return None
+            for event_seq, chunk in reversed(self._buffer):
+                if event_seq <= seq:
+                    break
+                events.append((event_seq, chunk))
+        events.reverse()
+        return events
+
+    async def subscribe(self, last_event_id=None, backfill_batch=1000):
+        """Yield encoded SSE chunks, starting after ``last_event_id`` (or now)."""
+        seq = self._last_seq if last_event_id is None else last_event_id
+        yield f"retry: {RETRY_MS}\n\n".encode()
+        while self._loop is not None:
+            wakeup = self._wakeup
+            events = self._buffered_after(seq)
+            if events is None:
+                # Too far behind for the buffer: catch up from the table
+                rows = await asyncio.to_thread(self.backfill, seq, self._floor, backfill_batch)
+                if not rows:
+                    seq = self._floor
+                    continue
+                for row in rows:
+                    yield format_event(row)
+                seq = rows[-1][0]
+                continue
+            if events:
+                for event_seq, chunk in events:
+                    yield chunk
+                seq = events[-1][0]
+                continue
+            try:
+                await asyncio.wait_for(wakeup.wait(), self.keepalive)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
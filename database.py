@@ -1,23 +1,320 @@
-import sqlite3
-
-def get_db():
-    conn = sqlite3.connect("movies.db")
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    conn = get_db()
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS movies (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        director TEXT,
-        year INTEGER,
-        genre TEXT,
-        rating INTEGER CHECK(rating BETWEEN 1 AND 5)
-    )
-    ''')
-    conn.commit()
-    conn.close()
-
-init_db()
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+# Connection settings, overridable through the environment
+DB_PATH = os.environ.get("MOVIES_DB", "movies.db")
+POOL_SIZE = int(os.environ.get("MOVIES_DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.environ.get("MOVIES_DB_POOL_TIMEOUT", "30"))
+STATEMENT_CACHE_SIZE = int(os.environ.get("MOVIES_DB_STATEMENT_CACHE", "256"))
+
+PRAGMAS = {
+    "journal_mode": os.environ.get("MOVIES_DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("MOVIES_DB_SYNCHRONOUS", "NORMAL"),
+    # Negative values are KiB, so the default is a 64 MiB page cache per connection
+    "cache_size": os.environ.get("MOVIES_DB_CACHE_SIZE", "-65536"),
+    "busy_timeout": os.environ.get("MOVIES_DB_BUSY_TIMEOUT", "5000"),
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+def get_db():
+    conn = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=metrics.TimedConnection if metrics.ENABLED else sqlite3.Connection,
+    )
+    conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class ConnectionPool:
+    """A bounded pool of long-lived connections.
+
+    Connections are opened lazily, up to ``size``, and handed back to the
+    pool after use so their page cache and prepared statements are reused.
+    """
+
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._permits = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        if not self._permits.acquire(timeout=self.timeout):
+            raise TimeoutError("Timed out waiting for a database connection")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return get_db()
+        except Exception:
+            self._permits.release()
+            raise
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+        except sqlite3.Error:
+            conn.close()
+        finally:
+            self._permits.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+pool = ConnectionPool()
+
+def get_conn():
+    """FastAPI dependency that borrows a pooled connection for one request."""
+    with pool.connection() as conn:
+        yield conn
+
+# Aggregate tables kept current by triggers on movies, one row per group
+STATS_TABLES = {
+    "genres": ("movie_genre_stats", "genre", "TEXT"),
+    "years": ("movie_year_stats", "year", "INTEGER"),
+}
+RATINGS = range(1, 6)
+
+def _stats_columns():
+    return ["movie_count", "rating_sum"] + [f"rating_{r}" for r in RATINGS]
+
+def _stats_aggregate_sql(column):
+    histogram = ", ".join(f"SUM(rating IS {r})" for r in RATINGS)
+    return (
+        f"SELECT {column}, COUNT(*), SUM(IFNULL(rating, 0)), {histogram}"
+        f" FROM movies WHERE {column} IS NOT NULL GROUP BY {column} ORDER BY {column}"
+    )
+
+def _stats_ddl(table, column, column_type):
+    histogram_columns = "".join(f"\n            rating_{r} INTEGER NOT NULL DEFAULT 0," for r in RATINGS)
+    added = ", ".join(f"new.rating IS {r}" for r in RATINGS)
+    increments = ", ".join(
+        f"{name} = {name} + excluded.{name}" for name in _stats_columns()
+    )
+    decrements = ", ".join(
+        ["movie_count = movie_count - 1", "rating_sum = rating_sum - IFNULL(old.rating, 0)"]
+        + [f"rating_{r} = rating_{r} - (old.rating IS {r})" for r in RATINGS]
+    )
+    add_new = f'''
+            INSERT INTO {table} ({column}, {", ".join(_stats_columns())})
+            SELECT new.{column}, 1, IFNULL(new.rating, 0), {added} WHERE new.{column} IS NOT NULL
+            ON CONFLICT ({column}) DO UPDATE SET {increments};'''
+    remove_old = f'''
+            UPDATE {table} SET {decrements} WHERE {column} = old.{column};
+            DELETE FROM {table} WHERE {column} = old.{column} AND movie_count = 0;'''
+    return f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            {column} {column_type} PRIMARY KEY,
+            movie_count INTEGER NOT NULL DEFAULT 0,
+            rating_sum INTEGER NOT NULL DEFAULT 0,{histogram_columns.rstrip(",")}
+        );
+        CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON movies BEGIN{add_new}
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON movies BEGIN{remove_old}
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {column}, rating ON movies BEGIN{remove_old}{add_new}
+        END;
+        '''
+
+def rebuild_stats(conn):
+    """Recompute the aggregate tables from movies.
+
+    Returns, per group kind, whether the stored aggregates had drifted.
+    """
+    drift = {}
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for kind, (table, column, _) in STATS_TABLES.items():
+            expected = [tuple(row) for row in conn.execute(_stats_aggregate_sql(column))]
+            stored = [tuple(row) for row in conn.execute(
+                f"SELECT {column}, {', '.join(_stats_columns())} FROM {table} ORDER BY {column}"
+            )]
+            drift[kind] = expected != stored
+            if drift[kind]:
+                conn.execute(f"DELETE FROM {table}")
+                conn.executemany(
+                    f"INSERT INTO {table} ({column}, {', '.join(_stats_columns())})"
+                    f" VALUES ({', '.join('?' * (len(_stats_columns()) + 1))})",
+                    expected,
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return drift
+
+def _stats_up():
+    script = ""
+    for table, column, column_type in STATS_TABLES.values():
+        script += _stats_ddl(table, column, column_type)
+        script += f"""
+        DELETE FROM {table};
+        INSERT INTO {table} ({column}, {', '.join(_stats_columns())}) {_stats_aggregate_sql(column)};
+        """
+    return script
+
+def _stats_down():
+    return "".join(
+        f"""
+        DROP TRIGGER IF EXISTS {table}_ai;
+        DROP TRIGGER IF EXISTS {table}_ad;
+        DROP TRIGGER IF EXISTS {table}_au;
+        DROP TABLE IF EXISTS {table};
+        """
+        for table, _, _ in STATS_TABLES.values()
+    )
+
+# Ordered schema migrations: (version, description, upgrade script, downgrade script).
+# Steps use IF [NOT] EXISTS so they also apply cleanly to databases created
+# before migrations were tracked.
+MIGRATIONS = [
+    (1, "create movies table", '''
+        CREATE TABLE IF NOT EXISTS movies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            director TEXT,
+            year INTEGER,
+            genre TEXT,
+            rating INTEGER CHECK(rating BETWEEN 1 AND 5)
+        );
+        ''', '''
+        DROP TABLE IF EXISTS movies;
+        '''),
+    (2, "duplicate check index used by the CSV importer", '''
+        CREATE INDEX IF NOT EXISTS idx_movies_title_year ON movies (title, year);
+        ''', '''
+        DROP INDEX IF EXISTS idx_movies_title_year;
+        '''),
+    (3, "filter and keyset pagination indexes for GET /movies/", '''
+        CREATE INDEX IF NOT EXISTS idx_movies_genre_year_rating ON movies (genre, year, rating);
+        CREATE INDEX IF NOT EXISTS idx_movies_year_rating ON movies (year, rating);
+        CREATE INDEX IF NOT EXISTS idx_movies_year_id ON movies (year, id);
+        CREATE INDEX IF NOT EXISTS idx_movies_rating_id ON movies (rating, id);
+        ''', '''
+        DROP INDEX IF EXISTS idx_movies_genre_year_rating;
+        DROP INDEX IF EXISTS idx_movies_year_rating;
+        DROP INDEX IF EXISTS idx_movies_year_id;
+        DROP INDEX IF EXISTS idx_movies_rating_id;
+        '''),
+    (4, "full-text index over title and director", '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+            title, director,
+            content='movies', content_rowid='id',
+            prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS movies_fts_ai AFTER INSERT ON movies BEGIN
+            INSERT INTO movies_fts (rowid, title, director) VALUES (new.id, new.title, new.director);
+        END;
+        CREATE TRIGGER IF NOT EXISTS movies_fts_ad AFTER DELETE ON movies BEGIN
+            INSERT INTO movies_fts (movies_fts, rowid, title, director) VALUES ('delete', old.id, old.title, old.director);
+        END;
+        CREATE TRIGGER IF NOT EXISTS movies_fts_au AFTER UPDATE OF title, director ON movies BEGIN
+            INSERT INTO movies_fts (movies_fts, rowid, title, director) VALUES ('delete', old.id, old.title, old.director);
+            INSERT INTO movies_fts (rowid, title, director) VALUES (new.id, new.title, new.director);
+        END;
+        INSERT INTO movies_fts (movies_fts) VALUES ('rebuild');
+        ''', '''
+        DROP TRIGGER IF EXISTS movies_fts_ai;
+        DROP TRIGGER IF EXISTS movies_fts_ad;
+        DROP TRIGGER IF EXISTS movies_fts_au;
+        DROP TABLE IF EXISTS movies_fts;
+        '''),
+    (5, "per-genre and per-year aggregate tables", _stats_up(), _stats_down()),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    return conn.execute("SELECT IFNULL(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def _statements(script):
+    """Split a migration script into single statements, keeping trigger bodies whole."""
+    statement = ""
+    for part in script.split(";"):
+        statement += part + ";"
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \n;"):
+                yield statement
+            statement = ""
+
+def migrate(conn, target=LATEST_VERSION):
+    """Upgrade or downgrade the schema to ``target``; returns the versions run.
+
+    Each step runs in its own transaction together with its schema_version
+    bookkeeping, so a failed step leaves the database at the previous version.
+    The version is re-read after BEGIN IMMEDIATE takes the write lock, so
+    processes migrating the same database at once apply every step only once.
+    """
+    current_version(conn)
+    ran = []
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        version = conn.execute("SELECT IFNULL(MAX(version), 0) FROM schema_version").fetchone()[0]
+        if target > version:
+            pending = [(v, up, ("INSERT INTO schema_version (version, description) VALUES (?, ?)", (v, d)))
+                       for v, d, up, _ in MIGRATIONS if version < v <= target]
+        else:
+            pending = [(v, down, ("DELETE FROM schema_version WHERE version = ?", (v,)))
+                       for v, _, _, down in reversed(MIGRATIONS) if target < v <= version]
+        if not pending:
+            conn.rollback()
+            return ran
+
+        step_version, script, bookkeeping = pending[0]
+        try:
+            for statement in _statements(script):
+                conn.execute(statement)
+            conn.execute(*bookkeeping)
+            conn.commit()
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            raise RuntimeError(f"Migration {step_version} failed: {e}") from e
+        ran.append(step_version)
+
+def init_db():
+    """Bring the database up to the latest schema; called from the app's startup hook."""
+    with pool.connection() as conn:
+        return migrate(conn)
+
+
+if __name__ == "__main__":
+    import sys
+
+    target = int(sys.argv[1]) if len(sys.argv) > 1 else LATEST_VERSION
+    with pool.connection() as conn:
+        before = current_version(conn)
+        ran = migrate(conn, target)
+    print(f"{DB_PATH}: schema version {before} -> {target} (ran {ran or 'nothing'})")
@@ -1,85 +1,298 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-from collections import Counter
-
-# Load dataset
-movies_df = pd.read_csv(r"C:\Users\SH.D Ferizaj\Downloads\Top_Movies_2019_to_2025.csv")
-# Sidebar filters
-st.sidebar.title("Filters")
-
-# Year filter
-selected_year = st.sidebar.multiselect(
-    "Select Year(s)",
-    sorted(movies_df["Year"].unique()),
-    default=sorted(movies_df["Year"].unique())
-)
-
-# Distributor filter
-selected_distributor = st.sidebar.multiselect(
-    "Select Distributor(s)",
-    sorted(movies_df["Distributor"].unique()),
-    default=sorted(movies_df["Distributor"].unique())
-)
-
-# Genre filter
-all_genres = set()
-for genres in movies_df['Genre']:
-    for g in genres.split(','):
-        all_genres.add(g.strip())
-selected_genres = st.sidebar.multiselect(
-    "Select Genre(s)",
-    sorted(all_genres),
-    default=sorted(all_genres)
-)
-
-# IMDb Rating filter
-min_rating, max_rating = st.sidebar.slider(
-    "Select IMDb Rating Range",
-    float(movies_df['IMDb Rating'].min()),
-    float(movies_df['IMDb Rating'].max()),
-    (float(movies_df['IMDb Rating'].min()), float(movies_df['IMDb Rating'].max())),
-    step=0.1
-)
-
-# Filter dataframe
-filtered_df = movies_df[
-    (movies_df["Year"].isin(selected_year)) &
-    (movies_df["Distributor"].isin(selected_distributor)) &
-    (movies_df["IMDb Rating"] >= min_rating) &
-    (movies_df["IMDb Rating"] <= max_rating) &
-    (movies_df["Genre"].apply(lambda x: any(g in x for g in selected_genres)))
-]
-
-# App title
-st.title("Most Viewed Movies (2019–2025) Analysis")
-st.write("This dashboard presents an analysis of popular movies between 2019 and 2025.")
-
-# Summary statistics
-st.subheader("Summary Statistics")
-col1, col2, col3, col4 = st.columns(4)
-col1.metric("Total Movies", filtered_df.shape[0])
-col2.metric("Unique Titles", filtered_df['Title'].nunique())
-col3.metric("Average IMDb Rating", round(filtered_df['IMDb Rating'].mean(), 2))
-col4.metric("Distributors", filtered_df['Distributor'].nunique())
-
-# Dataset preview
-st.subheader("Dataset Preview")
-st.dataframe(filtered_df.head(10))
-
-# Most common genres in filtered data
-st.subheader("Most Common Genres")
-genre_counter = Counter()
-for genre_list in filtered_df['Genre']:
-    genres = [g.strip() for g in genre_list.split(',')]
-    genre_counter.update(genres)
-
-genre_df = pd.DataFrame(genre_counter.items(), columns=["Genre", "Count"]).sort_values(by="Count", ascending=False)
-fig_genre = px.bar(genre_df.head(10), x="Genre", y="Count", title="Top 10 Genres")
-st.plotly_chart(fig_genre)
-
-# Top 10 movies by rating
-st.subheader("Top Rated Movies")
-top_rated = filtered_df.sort_values(by="IMDb Rating", ascending=False).head(10)
-fig_rating = px.bar(top_rated, x="Title", y="IMDb Rating", color="Distributor", title="Top 10 Rated Movies")
-st.plotly_chart(fig_rating)
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+
+import datasetch_duckdb
+
+try:
+    import pyarrow  # noqa: F401  (needed for the Parquet sidecar)
+except ImportError:
+    pyarrow = None
+
+# Source data: `streamlit run datasetch.py -- path/to/movies.csv [--engine duckdb]`,
+# else MOVIES_CSV, else the copy shipped next to this script. The pandas engine
+# holds the dataset in memory; the duckdb engine queries the file (a CSV, a
+# Parquet file or a directory of them) in place, for data larger than memory
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Top_Movies_2019_to_2025.csv")
+parser = argparse.ArgumentParser()
+parser.add_argument("path", nargs="?", default=os.environ.get("MOVIES_CSV", DEFAULT_CSV))
+parser.add_argument("--engine", choices=("pandas", "duckdb"),
+                    default=os.environ.get("MOVIES_DASHBOARD_ENGINE", "pandas"))
+args = parser.parse_args(sys.argv[1:])
+DATA_PATH, ENGINE = args.path, args.engine
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _read_sidecar(path, sidecar, meta_path, stat):
+    """Return the Parquet copy if it still matches the CSV, else None."""
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("size") != stat.st_size:
+        return None
+    if meta.get("mtime_ns") != stat.st_mtime_ns:
+        # Touched or copied: only reuse the sidecar if the content is identical
+        if meta.get("sha256") != _sha256(path):
+            return None
+        meta["mtime_ns"] = stat.st_mtime_ns
+        _write_json(meta_path, meta)
+    try:
+        return pd.read_parquet(sidecar)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+def _write_sidecar(df, path, sidecar, meta_path, stat):
+    try:
+        tmp = f"{sidecar}.tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, sidecar)
+        _write_json(meta_path, {
+            "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _sha256(path),
+        })
+    except OSError as e:
+        # Read-only data directory: keep working, just without the fast path
+        st.warning(f"Could not write the Parquet cache next to {path}: {e}")
+
+@st.cache_resource(show_spinner="Loading movies...")
+def load_movies(path, mtime_ns, size):
+    """Read the CSV once per file version, via its Parquet sidecar when current.
+
+    Shared across reruns and sessions without copying, so callers must not
+    modify the returned frame in place. mtime_ns and size are only part of
+    the cache key, so editing the CSV triggers a reload.
+    """
+    stat = os.stat(path)
+    sidecar, meta_path = f"{path}.parquet", f"{path}.parquet.json"
+    if pyarrow is not None:
+        df = _read_sidecar(path, sidecar, meta_path, stat)
+        if df is not None:
+            return df
+    df = pd.read_csv(path)
+    if pyarrow is not None:
+        _write_sidecar(df, path, sidecar, meta_path, stat)
+    return df
+
+# names: sorted genre names; bits: (rows, words) uint64 bitmask over names;
+# row_combo: each row's distinct Genre string; combo_hot: (strings, names) multi-hot
+GenreIndex = namedtuple("GenreIndex", "names bits row_combo combo_hot")
+
+@st.cache_resource(show_spinner="Indexing genres...")
+def encode_genres(path, mtime_ns, size):
+    """Parse the comma-separated Genre column once into a packed bitmask.
+
+    Bit ``i`` of a row is set if it has genre ``i``, so "has any of these
+    genres" is a single vectorized AND.
+    """
+    genre = load_movies(path, mtime_ns, size)["Genre"].fillna("")
+    # Far fewer distinct genre strings than rows: parse each string once and
+    # broadcast its bits to the rows that use it
+    row_combo, combos = pd.factorize(genre)
+    parsed = [[g.strip() for g in combo.split(",") if g.strip()] for combo in combos]
+    names = sorted({g for genres in parsed for g in genres})
+    positions = {name: i for i, name in enumerate(names)}
+    combo_of = np.repeat(np.arange(len(parsed)), [len(genres) for genres in parsed])
+    codes = np.array([positions[g] for genres in parsed for g in genres], dtype=np.int64)
+
+    words = max(1, -(-len(names) // 64))
+    combo_bits = np.zeros((len(parsed), words), dtype=np.uint64)
+    np.bitwise_or.at(combo_bits, (combo_of, codes // 64), np.left_shift(np.uint64(1), (codes % 64).astype(np.uint64)))
+    combo_hot = np.zeros((len(parsed), len(names)), dtype=bool)
+    combo_hot[combo_of, codes] = True
+    return GenreIndex(names, combo_bits[row_combo], row_combo, combo_hot)
+
+def genre_mask(index, selected):
+    """Rows having at least one of the selected genres."""
+    wanted = np.zeros(index.bits.shape[1], dtype=np.uint64)
+    positions = {name: i for i, name in enumerate(index.names)}
+    for name in selected:
+        i = positions[name]
+        wanted[i // 64] |= np.uint64(1) << np.uint64(i % 64)
+    hits = index.bits & wanted
+    # The common case fits in one word, where a plain compare beats any()
+    return hits[:, 0] != 0 if hits.shape[1] == 1 else hits.any(axis=1)
+
+def count_genres(index, mask=None):
+    """Rows per genre: count rows per distinct Genre string, then one weighted column sum."""
+    row_combo = index.row_combo if mask is None else index.row_combo[mask]
+    per_combo = np.bincount(row_combo, minlength=len(index.combo_hot))
+    return pd.Series(per_combo @ index.combo_hot, index=index.names)
+
+@st.cache_resource
+def all_genre_counts(path, mtime_ns, size):
+    return count_genres(encode_genres(path, mtime_ns, size))
+
+def cached_mask(name, key, compute):
+    """One filter's row mask, kept in the session and recomputed only when its control changes.
+
+    Returns the mask and whether it was recomputed.
+    """
+    masks = st.session_state.setdefault("filter_masks", {})
+    entry = masks.get(name)
+    if entry is not None and entry[0] == key:
+        return entry[1], False
+    mask = compute()
+    masks[name] = (key, mask)
+    return mask, True
+
+def combined_mask(masks):
+    """AND the per-filter masks; returns the result and a version that only moves when the rows change."""
+    state = st.session_state
+    combined = np.logical_and.reduce(masks)
+    previous = state.get("row_mask")
+    if previous is None or not np.array_equal(previous, combined):
+        state["row_mask"] = combined
+        state["row_mask_version"] = state.get("row_mask_version", 0) + 1
+    return state["row_mask"], state["row_mask_version"]
+
+data_stat = os.stat(DATA_PATH)
+dataset_version = (DATA_PATH, data_stat.st_mtime_ns, data_stat.st_size)
+if ENGINE == "duckdb":
+    if datasetch_duckdb.duckdb is None:
+        st.error("The duckdb engine needs the duckdb package (pip install duckdb).")
+        st.stop()
+    options = datasetch_duckdb.load_options(*dataset_version)
+    year_options, distributor_options = options["years"], options["distributors"]
+    genre_totals = options["genre_totals"]
+    genre_options = list(genre_totals)
+    rating_low, rating_high = options["rating_range"]
+else:
+    movies_df = load_movies(*dataset_version)
+    genre_index = encode_genres(*dataset_version)
+    genre_totals = all_genre_counts(*dataset_version)
+    year_options = sorted(movies_df["Year"].unique())
+    distributor_options = sorted(movies_df["Distributor"].unique())
+    genre_options = genre_index.names
+    rating_low, rating_high = float(movies_df['IMDb Rating'].min()), float(movies_df['IMDb Rating'].max())
+
+# Sidebar filters
+st.sidebar.title("Filters")
+
+# Year filter
+selected_year = st.sidebar.multiselect(
+    "Select Year(s)",
+    year_options,
+    default=year_options
+)
+
+# Distributor filter
+selected_distributor = st.sidebar.multiselect(
+    "Select Distributor(s)",
+    distributor_options,
+    default=distributor_options
+)
+
+# Genre filter
+selected_genres = st.sidebar.multiselect(
+    "Select Genre(s)",
+    genre_options,
+    default=genre_options,
+    format_func=lambda g: f"{g} ({genre_totals[g]:,})"
+)
+
+# IMDb Rating filter
+min_rating, max_rating = st.sidebar.slider(
+    "Select IMDb Rating Range",
+    rating_low,
+    rating_high,
+    (rating_low, rating_high),
+    step=0.1
+)
+
+if ENGINE == "duckdb":
+    results = datasetch_duckdb.query_dashboard(
+        *dataset_version, tuple(selected_year), tuple(selected_distributor),
+        tuple(selected_genres), min_rating, max_rating,
+    )
+    total_movies, unique_titles = results["movies"], results["titles"]
+    average_rating, distributor_count = results["avg_rating"], results["distributors"]
+    preview_df, genre_df, top_rated = results["preview"], results["top_genres"], results["top_rated"]
+else:
+    # Filter dataframe: each filter's mask is cached against its control's
+    # value, so a rerun only recomputes the filter that was touched
+    masks = [
+        cached_mask("year", (dataset_version, tuple(selected_year)),
+                    lambda: movies_df["Year"].isin(selected_year).to_numpy()),
+        cached_mask("distributor", (dataset_version, tuple(selected_distributor)),
+                    lambda: movies_df["Distributor"].isin(selected_distributor).to_numpy()),
+        cached_mask("rating", (dataset_version, min_rating, max_rating),
+                    lambda: movies_df["IMDb Rating"].between(min_rating, max_rating).to_numpy()),
+        cached_mask("genre", (dataset_version, tuple(selected_genres)),
+                    lambda: genre_mask(genre_index, selected_genres)),
+    ]
+    if any(changed for _, changed in masks) or "row_mask" not in st.session_state:
+        row_mask, mask_version = combined_mask([mask for mask, _ in masks])
+    else:
+        row_mask, mask_version = st.session_state["row_mask"], st.session_state["row_mask_version"]
+
+    # Everything shown below depends only on the selected rows of this file
+    # version, so it is rebuilt only when either actually changes (an edited
+    # CSV can leave an all-True mask untouched)
+    derived_version = (dataset_version, mask_version)
+    derived = st.session_state.get("derived")
+    if derived is None or derived["version"] != derived_version:
+        filtered_df = movies_df[row_mask]
+        # With nothing filtered out the cached totals are reused
+        genre_counts = genre_totals if row_mask.all() else count_genres(genre_index, row_mask)
+        derived = st.session_state["derived"] = {
+            "version": derived_version,
+            "total_movies": filtered_df.shape[0],
+            "unique_titles": filtered_df['Title'].nunique(),
+            "average_rating": filtered_df['IMDb Rating'].mean(),
+            "distributor_count": filtered_df['Distributor'].nunique(),
+            "preview": filtered_df.head(10),
+            "genres": (
+                genre_counts[genre_counts > 0].rename_axis("Genre").reset_index(name="Count")
+                .sort_values(by="Count", ascending=False)
+            ),
+            "top_rated": filtered_df.nlargest(10, "IMDb Rating"),
+        }
+    total_movies, unique_titles = derived["total_movies"], derived["unique_titles"]
+    average_rating, distributor_count = derived["average_rating"], derived["distributor_count"]
+    preview_df, genre_df, top_rated = derived["preview"], derived["genres"], derived["top_rated"]
+
+# App title
+st.title("Most Viewed Movies (2019–2025) Analysis")
+st.write("This dashboard presents an analysis of popular movies between 2019 and 2025.")
+
+# Summary statistics
+st.subheader("Summary Statistics")
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Total Movies", total_movies)
+col2.metric("Unique Titles", unique_titles)
+col3.metric("Average IMDb Rating", round(average_rating, 2))
+col4.metric("Distributors", distributor_count)
+
+# Dataset preview
+st.subheader("Dataset Preview")
+st.dataframe(preview_df)
+
+# Most common genres in filtered data
+st.subheader("Most Common Genres")
+fig_genre = px.bar(genre_df.head(10), x="Genre", y="Count", title="Top 10 Genres")
+st.plotly_chart(fig_genre)
+
+# Top 10 movies by rating
+st.subheader("Top Rated Movies")
+fig_rating = px.bar(top_rated, x="Title", y="IMDb Rating", color="Distributor", title="Top 10 Rated Movies")
+st.plotly_chart(fig_rating)
@@ -0,0 +1,130 @@
+import json
+import os
+
+import streamlit as st
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Out-of-core backend for datasetch.py: the sidebar filters become SQL
+# predicates pushed down into a DuckDB scan of the source files, and only
+# aggregates and top-10 lists ever reach pandas
+
+# Genre column parsed into a list of trimmed genre names
+GENRE_LIST = "list_distinct(list_transform(string_split(\"Genre\", ','), g -> trim(g)))"
+
+
+def _quote(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _sidecar_current(path, sidecar):
+    # Same meta file datasetch.load_movies writes next to the CSV
+    try:
+        with open(f"{sidecar}.json") as f:
+            meta = json.load(f)
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return False
+    return os.path.exists(sidecar) and (meta.get("size"), meta.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns)
+
+
+def source_sql(path):
+    """Table expression for the dataset: a CSV (or its current Parquet sidecar), a Parquet file or a directory of them."""
+    if path.lower().endswith(".csv"):
+        sidecar = f"{path}.parquet"
+        if _sidecar_current(path, sidecar):
+            return f"read_parquet({_quote(sidecar)})"
+        return f"read_csv_auto({_quote(path)})"
+    if os.path.isdir(path):
+        path = os.path.join(path, "**", "*.parquet")
+    return f"read_parquet({_quote(path)})"
+
+
+@st.cache_resource
+def get_connection():
+    if duckdb is None:
+        raise RuntimeError("The DuckDB engine needs duckdb (pip install duckdb)")
+    return duckdb.connect()
+
+
+def _query(sql, params=()):
+    # One cursor per query: a DuckDB connection must not be shared between
+    # the threads Streamlit runs sessions on
+    with get_connection().cursor() as cur:
+        return cur.execute(sql, list(params)).df()
+
+
+def _where(years, distributors, genres, min_rating, max_rating):
+    clauses, params = [], []
+    for column, values in (("Year", years), ("Distributor", distributors)):
+        if values:
+            clauses.append(f'"{column}" IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+        else:
+            clauses.append("FALSE")
+    if genres:
+        clauses.append(f"list_has_any({GENRE_LIST}, ?::VARCHAR[])")
+        params.append(list(genres))
+    else:
+        clauses.append("FALSE")
+    clauses.append('"IMDb Rating" BETWEEN ? AND ?')
+    params.extend([min_rating, max_rating])
+    return " AND ".join(clauses), params
+
+
+@st.cache_data(show_spinner="Scanning dataset...")
+def load_options(path, mtime_ns, size):
+    """Sidebar choices: distinct years and distributors, genre totals and the rating range."""
+    source = source_sql(path)
+    years = _query(f'SELECT DISTINCT "Year" FROM {source} WHERE "Year" IS NOT NULL ORDER BY 1')
+    distributors = _query(
+        f'SELECT DISTINCT "Distributor" FROM {source} WHERE "Distributor" IS NOT NULL ORDER BY 1'
+    )
+    genres = _query(
+        f'SELECT genre, COUNT(*) AS count FROM (SELECT unnest({GENRE_LIST}) AS genre FROM {source})'
+        " WHERE genre <> '' GROUP BY genre ORDER BY genre"
+    )
+    ratings = _query(f'SELECT MIN("IMDb Rating") AS low, MAX("IMDb Rating") AS high FROM {source}')
+    return {
+        "years": years["Year"].tolist(),
+        "distributors": distributors["Distributor"].tolist(),
+        "genre_totals": dict(zip(genres["genre"], genres["count"].tolist())),
+        "rating_range": (float(ratings["low"][0]), float(ratings["high"][0])),
+    }
+
+
+@st.cache_data(show_spinner="Querying...")
+def query_dashboard(path, mtime_ns, size, years, distributors, genres, min_rating, max_rating):
+    """Everything the dashboard shows for one filter state, computed inside DuckDB."""
+    source = source_sql(path)
+    where, params = _where(years, distributors, genres, min_rating, max_rating)
+    summary = _query(
+        'SELECT COUNT(*) AS movies, COUNT(DISTINCT "Title") AS titles,'
+        ' AVG("IMDb Rating") AS avg_rating, COUNT(DISTINCT "Distributor") AS distributors'
+        f" FROM {source} WHERE {where}",
+        params,
+    ).iloc[0]
+    preview = _query(f"SELECT * FROM {source} WHERE {where} LIMIT 10", params)
+    top_genres = _query(
+        f'SELECT genre AS "Genre", COUNT(*) AS "Count"'
+        f" FROM (SELECT unnest({GENRE_LIST}) AS genre FROM {source} WHERE {where})"
+        f""" WHERE genre <> '' GROUP BY genre ORDER BY "Count" DESC, genre LIMIT 10""",
+        params,
+    )
+    top_rated = _query(
+        f'SELECT "Title", "IMDb Rating", "Distributor" FROM {source} WHERE {where}'
+        ' ORDER BY "IMDb Rating" DESC LIMIT 10',
+        params,
+    )
+    return {
+        "movies": int(summary["movies"]),
+        "titles": int(summary["titles"]),
+        "avg_rating": float("nan") if summary["avg_rating"] is None else float(summary["avg_rating"]),
+        "distributors": int(summary["distributors"]),
+        "preview": preview,
+        "top_genres": top_genres,
+        "top_rated": top_rated,
+    }
@@ -0,0 +1,132 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    """Funnels single-row writes through one thread that commits them in batches.
+
+    Callers ``submit()`` a statement and get a Future. The writer collects
+    statements for up to ``max_delay`` seconds or ``max_batch`` items, runs
+    them in one transaction and commits once, so concurrent writers share a
+    single fsync. A Future is only resolved after the COMMIT that covers it
+    has returned; how durable that commit is depends on ``synchronous``
+    (FULL survives power loss, NORMAL in WAL mode may lose the last batches
+    on power loss but never corrupts the database). A Future cancelled
+    before its batch starts is dropped without running its statement.
+    """
+
+    def __init__(self, connect, max_batch=256, max_delay=0.005, synchronous="FULL", on_commit=None):
+        self.connect = connect
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.synchronous = synchronous
+        self.on_commit = on_commit
+        self._queue = queue.Queue()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Flush everything already submitted, then stop the writer thread."""
+        if not self.running:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, sql, params):
+        if not self.running:
+            raise RuntimeError("Group commit writer is not running")
+        future = Future()
+        self._queue.put((sql, params, future))
+        return future
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = self.connect()
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is None:
+                    break
+                batch, stopping = self._collect(first)
+                self._commit(conn, batch)
+            # Drain anything submitted concurrently with stop()
+            leftovers = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    leftovers.append(item)
+            if leftovers:
+                self._commit(conn, leftovers)
+        finally:
+            conn.close()
+
+    def _commit(self, conn, batch):
+        # Callers that gave up waiting cancelled their futures: skip those
+        # writes; the rest can no longer be cancelled from here on
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql, params, _ in batch:
+                # A failing statement only aborts itself, not the transaction
+                try:
+                    results.append(conn.execute(sql, params).lastrowid)
+                except Exception as e:
+                    results.append(e)
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        if self.on_commit is not None:
+            # The batch is durable either way: a failing hook must neither
+            # strand its futures nor kill the writer thread
+            try:
+                self.on_commit()
+            except Exception:
+                logger.exception("Group commit on_commit hook failed")
+        for (_, _, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,123 @@
+"""Import a movie CSV (e.g. Top_Movies_2019_to_2025.csv) into movies.db.
+
+The file is streamed in chunks, so memory stays flat regardless of its size.
+Columns are mapped onto the movies table as:
+
+    Title -> title, Distributor -> director, Year -> year,
+    first entry of Genre -> genre, IMDb Rating (0-10) -> rating (1-5)
+
+A blank Distributor or Genre is stored as "Unknown", since the API serves
+both as required strings. Rows whose (title, year) already exist are
+skipped, so re-running an import is idempotent.
+
+With --defer-indexes the schema is migrated down to the dedupe index for
+the load and back up at the end, which rebuilds the other indexes, the
+full-text index and the aggregate tables once. That is much faster for
+large files, but search, stats and facets are gone until it finishes, so
+only use it while the API is not running.
+
+    python import_csv.py Top_Movies_2019_to_2025.csv [--db movies.db] [--defer-indexes]
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+INSERT_NEW_MOVIE = (
+    "INSERT INTO movies (title, director, year, genre, rating)"
+    " SELECT ?, ?, ?, ?, ?"
+    " WHERE NOT EXISTS (SELECT 1 FROM movies WHERE title = ? AND year = ?)"
+)
+
+# Schema version kept during the load: the duplicate check needs the
+# (title, year) index, everything after it is dropped and rebuilt at the end
+LOAD_SCHEMA_VERSION = 2
+# Stored for a blank Distributor or Genre
+UNKNOWN = "Unknown"
+
+
+def map_row(row):
+    """Map one CSV record onto movies columns; raises ValueError if unusable."""
+    title = (row.get("Title") or "").strip()
+    if not title:
+        raise ValueError("missing Title")
+    year = int(row["Year"])
+    imdb_rating = float(row["IMDb Rating"])
+    rating = min(5, max(1, int(imdb_rating / 2 + 0.5)))
+    genre = (row.get("Genre") or "").split(",")[0].strip() or UNKNOWN
+    director = (row.get("Distributor") or "").strip() or UNKNOWN
+    return title, director, year, genre, rating
+
+
+def read_chunks(path, chunk_size, stats):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        chunk = []
+        for line_number, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                values = map_row(row)
+            except (KeyError, TypeError, ValueError) as e:
+                stats["invalid"] += 1
+                print(f"line {line_number}: skipped ({e})", file=sys.stderr)
+                continue
+            chunk.append(values + (values[0], values[2]))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def import_csv(path, conn, database, chunk_size=50_000, defer_indexes=False):
+    stats = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0}
+    start = time.perf_counter()
+    database.migrate(conn)
+    if defer_indexes:
+        database.migrate(conn, LOAD_SCHEMA_VERSION)
+    try:
+        for chunk in read_chunks(path, chunk_size, stats):
+            # rowcount sums sqlite3_changes() per statement, which unlike
+            # total_changes leaves out rows written by the FTS/stats triggers
+            inserted = conn.executemany(INSERT_NEW_MOVIE, chunk).rowcount
+            conn.commit()
+            stats["read"] += len(chunk)
+            stats["inserted"] += inserted
+            stats["duplicates"] += len(chunk) - inserted
+            elapsed = time.perf_counter() - start
+            print(f"{stats['read']:>12,} rows  {stats['read'] / elapsed:>10,.0f} rows/s", file=sys.stderr)
+    finally:
+        if defer_indexes:
+            print("rebuilding indexes and aggregates...", file=sys.stderr)
+            database.migrate(conn)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("csv_path", help="CSV file with Title, Year, Distributor, IMDb Rating and Genre columns")
+    parser.add_argument("--db", help="SQLite file to import into (default: MOVIES_DB or movies.db)")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="rows per transaction")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="drop indexes and triggers for the load and rebuild them at the end"
+                             " (faster, offline only: search, stats and facets are down meanwhile)")
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["MOVIES_DB"] = args.db
+    import database
+
+    conn = database.get_db()
+    try:
+        stats = import_csv(args.csv_path, conn, database, args.chunk_size, args.defer_indexes)
+    finally:
+        conn.close()
+    rate = stats["read"] / stats["seconds"] if stats["seconds"] else 0
+    print(
+        f"read {stats['read']:,} rows in {stats['seconds']:.2f}s ({rate:,.0f} rows/s): "
+        f"{stats['inserted']:,} inserted, {stats['duplicates']:,} duplicates, {stats['invalid']:,} invalid"
+    )
+
+
+if __name__ == "__main__":
+    run()
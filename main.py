@@ -1,28 +1,531 @@
-from fastapi import FastAPI, HTTPException
-from schemas import Movie, MovieOut
-from database import get_db
-
-app = FastAPI()
-
-@app.post("/movies/", response_model=MovieOut)
-def add_movie(movie: Movie):
-    conn = get_db()
-    try:
-        cursor = conn.execute(
-            "INSERT INTO movies (title, director, year, genre, rating) VALUES (?, ?, ?, ?, ?)",
-            (movie.title, movie.director, movie.year, movie.genre, movie.rating)
-        )
-        conn.commit()
-        movie_id = cursor.lastrowid
-        return {**movie.dict(), "id": movie_id}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        conn.close()
-
-@app.get("/movies/", response_model=list[MovieOut])
-def get_movies():
-    conn = get_db()
-    rows = conn.execute("SELECT * FROM movies").fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+import asyncio
+import base64
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from schemas import BulkResult, Movie, MovieFacets, MovieOut, MovieStats, StatsRebuild
+from database import RATINGS, STATS_TABLES, get_conn, get_db, init_db, pool, rebuild_stats
+from change_feed import CHANGE_SELECT, ChangeFeed
+from group_commit import GroupCommitWriter
+import metrics
+from response_cache import ResponseCache
+from snapshot import MovieSnapshot
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Serialized GET responses, dropped whenever a write commits here or elsewhere
+movies_cache = ResponseCache(connect=get_db)
+movie_list = TypeAdapter(list[MovieOut])
+movie_stats = TypeAdapter(MovieStats)
+movie_facets = TypeAdapter(MovieFacets)
+
+# Opt-in: serialize list responses straight from DB rows without per-item validation
+FAST_JSON = os.environ.get("MOVIES_FAST_JSON", "0") == "1"
+
+# Columns selected for list responses, in MovieOut field order
+MOVIE_FIELDS = tuple(MovieOut.model_fields)
+MOVIE_SELECT = ", ".join(f"movies.{field}" for field in MOVIE_FIELDS)
+
+# Opt-in: answer GET /movies/ from an in-memory columnar copy of the table (needs numpy)
+SNAPSHOT = os.environ.get("MOVIES_SNAPSHOT", "0") == "1"
+movie_snapshot = MovieSnapshot(get_db) if SNAPSHOT else None
+
+def _backfill_changes(after, up_to, limit):
+    return _query_rows(f"{CHANGE_SELECT} WHERE id > ? AND id <= ? ORDER BY id LIMIT ?", (after, up_to, limit))
+
+# Inserted movies pushed to GET /movies/changes subscribers
+change_feed = ChangeFeed(get_db, _backfill_changes)
+
+def _movies_changed():
+    # Runs after every committed write; the snapshot catches up before
+    # cached responses are dropped, so rebuilt entries see the new rows.
+    # Our own commit is absorbed first so it is not seen again as a foreign one
+    movies_cache.changed_elsewhere()
+    if movie_snapshot is not None:
+        movie_snapshot.sync()
+    movies_cache.invalidate()
+    change_feed.sync()
+
+# Opt-in: batch concurrent add_movie calls into shared commits on one writer thread
+GROUP_COMMIT = os.environ.get("MOVIES_GROUP_COMMIT", "0") == "1"
+group_writer = GroupCommitWriter(
+    get_db,
+    max_batch=int(os.environ.get("MOVIES_GROUP_COMMIT_MAX_BATCH", "256")),
+    max_delay=float(os.environ.get("MOVIES_GROUP_COMMIT_MAX_DELAY_MS", "5")) / 1000,
+    synchronous=os.environ.get("MOVIES_GROUP_COMMIT_SYNCHRONOUS", "FULL"),
+    on_commit=_movies_changed,
+) if GROUP_COMMIT else None
+# How long add_movie waits for the writer before giving up on a response
+GROUP_COMMIT_TIMEOUT = float(os.environ.get("MOVIES_GROUP_COMMIT_TIMEOUT", "30"))
+
+@asynccontextmanager
+async def lifespan(app):
+    await run_in_threadpool(init_db)
+    if movie_snapshot is not None:
+        await run_in_threadpool(movie_snapshot.load)
+    await run_in_threadpool(change_feed.start, asyncio.get_running_loop())
+    if group_writer is not None:
+        group_writer.start()
+    yield
+    if group_writer is not None:
+        await run_in_threadpool(group_writer.stop)
+    change_feed.stop()
+    if movie_snapshot is not None:
+        movie_snapshot.close()
+    movies_cache.close()
+    pool.close()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+INSERT_MOVIE = "INSERT INTO movies (title, director, year, genre, rating) VALUES (?, ?, ?, ?, ?)"
+
+# Rows per executemany call when ingesting through /movies/bulk
+BULK_CHUNK_SIZE = 5000
+
+# Rows fetched per cursor read when streaming /movies/export
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_COLUMNS = ("id", "title", "director", "year", "genre", "rating")
+
+# BM25 column weights for /movies/search: title matches outrank director matches
+SEARCH_TITLE_WEIGHT = 10.0
+SEARCH_DIRECTOR_WEIGHT = 1.0
+
+def _insert_movie(values):
+    with pool.connection() as conn:
+        movie_id = conn.execute(INSERT_MOVIE, values).lastrowid
+        conn.commit()
+    _movies_changed()
+    return movie_id
+
+@app.post("/movies/", response_model=MovieOut)
+async def add_movie(movie: Movie):
+    values = (movie.title, movie.director, movie.year, movie.genre, movie.rating)
+    try:
+        if group_writer is not None:
+            movie_id = await asyncio.wait_for(
+                asyncio.wrap_future(group_writer.submit(INSERT_MOVIE, values)), GROUP_COMMIT_TIMEOUT
+            )
+        else:
+            movie_id = await run_in_threadpool(_insert_movie, values)
+        return {**movie.dict(), "id": movie_id}
+    except asyncio.TimeoutError:
+        # The write may still commit; the client only learns it did not in time
+        raise HTTPException(status_code=503, detail="Timed out waiting for the write to commit")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _validate_movie(index, item, rows, errors):
+    try:
+        movie = Movie.model_validate(item)
+    except ValidationError as e:
+        errors.append({"index": index, "error": str(e)})
+    else:
+        rows.append((index, (movie.title, movie.director, movie.year, movie.genre, movie.rating)))
+
+def _insert_chunk(conn, chunk, ids, errors):
+    conn.execute("SAVEPOINT bulk_chunk")
+    try:
+        conn.executemany(INSERT_MOVIE, [values for _, values in chunk])
+    except sqlite3.IntegrityError:
+        # Some row violates a constraint: undo the chunk and retry row by row
+        # so the good rows still go in and the bad ones are reported
+        conn.execute("ROLLBACK TO bulk_chunk")
+        for index, values in chunk:
+            try:
+                ids[index] = conn.execute(INSERT_MOVIE, values).lastrowid
+            except sqlite3.IntegrityError as e:
+                errors.append({"index": index, "error": str(e)})
+    else:
+        # The write lock is held for the whole transaction and ids are
+        # AUTOINCREMENT, so a chunk always receives a contiguous id range
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        first_id = last_id - len(chunk) + 1
+        for offset, (index, _) in enumerate(chunk):
+            ids[index] = first_id + offset
+    conn.execute("RELEASE bulk_chunk")
+
+def _insert_movies(rows, ids, errors):
+    # Borrowed only for the write itself, not while the upload is still being read
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for start in range(0, len(rows), BULK_CHUNK_SIZE):
+                _insert_chunk(conn, rows[start:start + BULK_CHUNK_SIZE], ids, errors)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    _movies_changed()
+
+@app.post(
+    "/movies/bulk",
+    response_model=BulkResult,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": Movie.model_json_schema()}},
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def add_movies_bulk(request: Request):
+    rows, errors = [], []
+    count = 0
+    content_type = request.headers.get("content-type", "")
+
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        # Parse the stream line by line so the raw payload is never held whole
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    try:
+                        item = json.loads(line)
+                    except ValueError as e:
+                        errors.append({"index": count, "error": f"Invalid JSON: {e}"})
+                    else:
+                        _validate_movie(count, item, rows, errors)
+                    count += 1
+        if buffer.strip():
+            try:
+                _validate_movie(count, json.loads(buffer), rows, errors)
+            except ValueError as e:
+                errors.append({"index": count, "error": f"Invalid JSON: {e}"})
+            count += 1
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of movies")
+        for index, item in enumerate(items):
+            _validate_movie(index, item, rows, errors)
+        count = len(items)
+
+    ids = [None] * count
+    if rows:
+        try:
+            await run_in_threadpool(_insert_movies, rows, ids, errors)
+        except sqlite3.Error as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    errors.sort(key=lambda error: error["index"])
+    inserted = sum(1 for movie_id in ids if movie_id is not None)
+    return {"inserted": inserted, "ids": ids, "errors": errors}
+
+def _filter_clauses(genre, min_rating, year_from, year_to):
+    # Build the WHERE clause from the supplied filters only, always with placeholders
+    clauses, params = [], []
+    if genre is not None:
+        clauses.append("genre = ?")
+        params.append(genre)
+    if min_rating is not None:
+        clauses.append("rating >= ?")
+        params.append(min_rating)
+    if year_from is not None:
+        clauses.append("year >= ?")
+        params.append(year_from)
+    if year_to is not None:
+        clauses.append("year <= ?")
+        params.append(year_to)
+    return clauses, params
+
+def _cached_response(key, if_none_match, build):
+    if movies_cache.changed_elsewhere():
+        # Another process wrote to the database: catch up like after our own write
+        _movies_changed()
+    version = movies_cache.version
+    etag = movies_cache.etag(key, version)
+    headers = movies_cache.headers(etag)
+    if movies_cache.not_modified(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    entry = movies_cache.get(key)
+    if entry is None:
+        entry = build()
+        movies_cache.put(key, version, entry)
+    body, extra_headers = entry
+    return Response(content=body, media_type="application/json", headers={**headers, **extra_headers})
+
+def _query_rows(sql, params):
+    with pool.connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def _serialize_movies(rows):
+    return _serialize_items([dict(zip(MOVIE_FIELDS, row)) for row in rows])
+
+def _serialize_items(items):
+    if FAST_JSON:
+        return _serialize_items_fast(items)
+    return movie_list.dump_json(movie_list.validate_python(items))
+
+def _serialize_items_fast(items):
+    # Items come straight from the movies table (or its snapshot), whose
+    # constraints already match MovieOut, so skip per-item validation
+    if orjson is not None:
+        return orjson.dumps(items)
+    return json.dumps(items, separators=(",", ":"), ensure_ascii=False).encode()
+
+def _encode_cursor(sort, order, row):
+    payload = json.dumps([sort, order, row[sort], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def _decode_cursor(token, sort, order):
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        cursor_sort, cursor_order, key, last_id = json.loads(payload)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different sort order")
+    if not isinstance(key, int) or not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key, last_id
+
+@app.get(
+    "/movies/",
+    response_model=list[MovieOut],
+    responses={200: {"headers": {"X-Next-Cursor": {
+        "description": "Opaque cursor for the next page, present when the page is full",
+        "schema": {"type": "string"},
+    }}}},
+)
+def get_movies(
+    genre: Optional[str] = None,
+    min_rating: Optional[int] = Query(None, ge=1, le=5),
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    sort: str = Query("id", pattern="^(id|year|rating)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    clauses, params = _filter_clauses(genre, min_rating, year_from, year_to)
+
+    # Keyset pagination: resume strictly after the last (sort key, id) seen,
+    # so deep pages cost the same as the first and concurrent inserts can't
+    # shift rows between pages
+    direction, comparison = ("DESC", "<") if order == "desc" else ("ASC", ">")
+    after = None
+    if cursor is not None:
+        if offset:
+            raise HTTPException(status_code=400, detail="cursor and offset cannot be combined")
+        after = key, last_id = _decode_cursor(cursor, sort, order)
+        if sort == "id":
+            clauses.append(f"id {comparison} ?")
+            params.append(last_id)
+        else:
+            clauses.append(f"({sort}, id) {comparison} (?, ?)")
+            params.extend([key, last_id])
+
+    sql = f"SELECT {MOVIE_SELECT} FROM movies"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if sort == "id":
+        sql += f" ORDER BY id {direction}"
+    else:
+        sql += f" ORDER BY {sort} {direction}, id {direction}"
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+    elif offset:
+        sql += " LIMIT -1 OFFSET ?"
+        params.append(offset)
+
+    def build():
+        if movie_snapshot is not None:
+            rows = movie_snapshot.query(genre, min_rating, year_from, year_to, limit, offset, sort, order, after)
+            body = _serialize_items(rows)
+        else:
+            rows = _query_rows(sql, params)
+            body = _serialize_movies(rows)
+        extra_headers = {}
+        if limit is not None and len(rows) == limit:
+            extra_headers["X-Next-Cursor"] = _encode_cursor(sort, order, rows[-1])
+        return body, extra_headers
+
+    key = ("movies", genre, min_rating, year_from, year_to, limit, offset, sort, order, cursor)
+    return _cached_response(key, if_none_match, build)
+
+@app.get("/movies/search", response_model=list[MovieOut])
+def search_movies(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    if_none_match: Optional[str] = Header(None),
+):
+    # Quote every term so user input can't inject FTS syntax, and make each
+    # one a prefix match; terms are implicitly AND-ed
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return []
+    match = " ".join(f'"{term}"*' for term in terms)
+    sql = (
+        f"SELECT {MOVIE_SELECT} FROM movies_fts JOIN movies ON movies.id = movies_fts.rowid"
+        " WHERE movies_fts MATCH ?"
+        f" ORDER BY bm25(movies_fts, {SEARCH_TITLE_WEIGHT}, {SEARCH_DIRECTOR_WEIGHT})"
+        " LIMIT ?"
+    )
+
+    key = ("search", match, limit)
+    return _cached_response(key, if_none_match, lambda: (_serialize_movies(_query_rows(sql, [match, limit])), {}))
+
+def _read_stats(conn):
+    stats = {}
+    for kind, (table, column, _) in STATS_TABLES.items():
+        rows = conn.execute(f"SELECT * FROM {table} ORDER BY {column}").fetchall()
+        groups = []
+        for row in rows:
+            histogram = {r: row[f"rating_{r}"] for r in RATINGS}
+            rated = sum(histogram.values())
+            groups.append({
+                column: row[column],
+                "count": row["movie_count"],
+                "average_rating": round(row["rating_sum"] / rated, 2) if rated else None,
+                "histogram": histogram,
+            })
+        stats[kind] = groups
+    return stats
+
+@app.get("/movies/stats", response_model=MovieStats)
+def get_movie_stats(if_none_match: Optional[str] = Header(None)):
+    def build():
+        with pool.connection() as conn:
+            stats = _read_stats(conn)
+        return movie_stats.dump_json(movie_stats.validate_python(stats)), {}
+
+    return _cached_response(("stats",), if_none_match, build)
+
+@app.post("/movies/stats/rebuild", response_model=StatsRebuild)
+def rebuild_movie_stats(conn: sqlite3.Connection = Depends(get_conn)):
+    drift = rebuild_stats(conn)
+    if any(drift.values()):
+        movies_cache.invalidate()
+    return {"drift": drift}
+
+def _read_facets(conn):
+    # The per-genre and per-year aggregate tables already hold every facet,
+    # so this is O(groups) no matter how many movies there are
+    genre_table, genre_column, _ = STATS_TABLES["genres"]
+    year_table, year_column, _ = STATS_TABLES["years"]
+    genres = [
+        {"genre": row[genre_column], "count": row["movie_count"]}
+        for row in conn.execute(
+            f"SELECT {genre_column}, movie_count FROM {genre_table} ORDER BY movie_count DESC, {genre_column}"
+        )
+    ]
+    year_min, year_max = conn.execute(f"SELECT MIN({year_column}), MAX({year_column}) FROM {year_table}").fetchone()
+    totals = conn.execute(
+        f"SELECT {', '.join(f'IFNULL(SUM(rating_{r}), 0)' for r in RATINGS)} FROM {genre_table}"
+    ).fetchone()
+    return {
+        "genres": genres,
+        "year_min": year_min,
+        "year_max": year_max,
+        "rating_histogram": dict(zip(RATINGS, totals)),
+    }
+
+@app.get("/movies/facets", response_model=MovieFacets)
+def get_movie_facets(if_none_match: Optional[str] = Header(None)):
+    def build():
+        with pool.connection() as conn:
+            facets = _read_facets(conn)
+        return movie_facets.dump_json(movie_facets.validate_python(facets)), {}
+
+    return _cached_response(("facets",), if_none_match, build)
+
+def _export_chunks(clauses, params, export_format):
+    # Pages through the table by id and borrows a pooled connection only for
+    # each page, so a slow client never holds a pool slot or a read transaction
+    sql = (
+        f"SELECT {', '.join(EXPORT_COLUMNS)} FROM movies"
+        f" WHERE {' AND '.join([*clauses, 'id > ?'])} ORDER BY id LIMIT ?"
+    )
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue()
+    last_id = 0
+    while True:
+        rows = _query_rows(sql, [*params, last_id, EXPORT_CHUNK_SIZE])
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        if export_format == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            yield buffer.getvalue()
+        else:
+            yield "".join(json.dumps(dict(row)) + "\n" for row in rows)
+        if len(rows) < EXPORT_CHUNK_SIZE:
+            break
+
+@app.get(
+    "/movies/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}},
+)
+def export_movies(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    genre: Optional[str] = None,
+    min_rating: Optional[int] = Query(None, ge=1, le=5),
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+):
+    clauses, params = _filter_clauses(genre, min_rating, year_from, year_to)
+    if export_format == "csv":
+        media_type, filename = "text/csv", "movies.csv"
+    else:
+        media_type, filename = "application/x-ndjson", "movies.ndjson"
+    return StreamingResponse(
+        _export_chunks(clauses, params, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get(
+    "/movies/changes",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def movie_changes(last_event_id: Optional[str] = Header(None)):
+    # Each event carries the new movie's id; a reconnecting EventSource sends
+    # the last one back, and everything after it is replayed
+    if last_event_id is not None:
+        try:
+            last_event_id = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be a movie id")
+    return StreamingResponse(
+        change_feed.subscribe(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
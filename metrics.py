@@ -0,0 +1,253 @@
+import bisect
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Request and SQL instrumentation, exposed in Prometheus text format
+
+ENABLED = os.environ.get("MOVIES_METRICS", "1") == "1"
+# Statements slower than this are logged; 0 disables the slow query log
+SLOW_QUERY_MS = float(os.environ.get("MOVIES_SLOW_QUERY_MS", "0"))
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, label_values=(), amount=1):
+        self.inc(label_values, -amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items()]
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labels + ("le",), label_values + (le,))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests.", ("method", "route", "status"),
+))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled.", ("method",),
+))
+SQL_STATEMENT_SECONDS = registry.register(Histogram(
+    "sql_statement_duration_seconds", "Time spent executing SQL statements, up to the first row.", ("operation",),
+))
+SQL_FETCH_SECONDS = registry.register(Counter(
+    "sql_fetch_seconds_total", "Time spent fetching result rows.", ("operation",),
+))
+SQL_ROWS = registry.register(Counter(
+    "sql_rows_returned_total", "Rows fetched from SQL statements.", ("operation",),
+))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and in-flight requests per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        method = scope["method"]
+        # The route template is only known once the router has run, so the
+        # in-flight gauge is labelled by method alone
+        in_flight = (method,)
+        HTTP_IN_FLIGHT.inc(in_flight)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec(in_flight)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe((method, path, status), time.perf_counter() - start)
+
+
+_OPERATION = re.compile(r"\s*(\w+)")
+# Statement text -> leading keyword; statements are reused, so this stays small
+_operations = {}
+
+
+def _operation(sql):
+    operation = _operations.get(sql)
+    if operation is None:
+        match = _OPERATION.match(sql)
+        operation = match.group(1).upper() if match else "UNKNOWN"
+        if len(_operations) < 10_000:
+            _operations[sql] = operation
+    return operation
+
+
+def _record_statement(operation, sql, elapsed):
+    SQL_STATEMENT_SECONDS.observe((operation,), elapsed)
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("slow query (%.1f ms): %s", elapsed * 1000, " ".join(sql.split()))
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that times statements and counts the rows fetched from them."""
+
+    _operation = "UNKNOWN"
+
+    def execute(self, sql, parameters=()):
+        self._operation = _operation(sql)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_statement(self._operation, sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._operation = _operation(sql)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_statement(self._operation, sql, time.perf_counter() - start)
+
+    def _fetched(self, rows, start):
+        SQL_FETCH_SECONDS.inc((self._operation,), time.perf_counter() - start)
+        SQL_ROWS.inc((self._operation,), rows)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(0 if row is None else 1, start)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(len(rows), start)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), start)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(0, start)
+            raise
+        self._fetched(1, start)
+        return row
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose shortcut methods go through TimedCursor."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,95 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+
+
+class ResponseCache:
+    """In-process cache of serialized responses, invalidated by a version counter.
+
+    Every write path calls ``invalidate()``, which bumps the version and drops
+    all entries. ETags are derived from the version and the cache key alone,
+    so a matching ``If-None-Match`` can be answered without a lookup.
+
+    Writes made by other processes (another uvicorn worker, the CSV
+    importer) never reach ``invalidate()`` here. Given ``connect``, callers
+    use ``changed_elsewhere()`` before trusting an entry or ETag; it polls
+    ``PRAGMA data_version`` on a connection of its own, which moves
+    whenever any other connection commits. ETags also carry a per-process
+    token, so one worker never confirms another worker's ETag.
+    """
+
+    def __init__(self, max_entries=256, connect=None):
+        self.max_entries = max_entries
+        self.connect = connect
+        self.version = 0
+        self.last_modified = time.time()
+        # Distinguishes ETags issued before a restart, when the version resets
+        self._instance = secrets.token_hex(4)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._watch = None
+        self._data_version = None
+        self._watch_lock = threading.Lock()
+
+    def etag(self, key, version):
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+        # Weak, because the same payload may be sent gzip-encoded or not
+        return f'W/"{self._instance}-{version}-{digest}"'
+
+    def headers(self, etag):
+        return {
+            "ETag": etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+
+    def not_modified(self, if_none_match, etag):
+        if not if_none_match:
+            return False
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, version, entry):
+        with self._lock:
+            # A write landed while this entry was being built, so it may be stale
+            if version != self.version:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def changed_elsewhere(self):
+        """Whether the database changed through another connection since the last call."""
+        if self.connect is None:
+            return False
+        with self._watch_lock:
+            if self._watch is None:
+                self._watch = self.connect()
+            data_version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+            changed = self._data_version is not None and data_version != self._data_version
+            self._data_version = data_version
+            return changed
+
+    def close(self):
+        with self._watch_lock:
+            if self._watch is not None:
+                self._watch.close()
+                self._watch = None
+                self._data_version = None
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self.last_modified = time.time()
+            self._entries.clear()
@@ -1,11 +1,50 @@
-from pydantic import BaseModel
-
-class Movie(BaseModel):
-    title: str
-    director: str
-    year: int
-    genre: str
-    rating: int
-
-class MovieOut(Movie):
-    id: int
+from typing import Optional
+
+from pydantic import BaseModel
+
+class Movie(BaseModel):
+    title: str
+    director: str
+    year: int
+    genre: str
+    rating: int
+
+class MovieOut(Movie):
+    id: int
+
+class BulkError(BaseModel):
+    index: int
+    error: str
+
+class BulkResult(BaseModel):
+    inserted: int
+    ids: list[Optional[int]]
+    errors: list[BulkError]
+
+class GroupStats(BaseModel):
+    count: int
+    average_rating: Optional[float]
+    histogram: dict[int, int]
+
+class GenreStats(GroupStats):
+    genre: str
+
+class YearStats(GroupStats):
+    year: int
+
+class MovieStats(BaseModel):
+    genres: list[GenreStats]
+    years: list[YearStats]
+
+class StatsRebuild(BaseModel):
+    drift: dict[str, bool]
+
+class GenreCount(BaseModel):
+    genre: str
+    count: int
+
+class MovieFacets(BaseModel):
+    genres: list[GenreCount]
+    year_min: Optional[int]
+    year_max: Optional[int]
+    rating_histogram: dict[int, int]
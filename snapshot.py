@@ -0,0 +1,225 @@
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Sort keys for NULL year/rating, chosen so NULLs order first like SQLite does
+NULL_YEAR = -(1 << 62)
+NULL_RATING = 0
+NO_GENRE = -1
+
+
+class _View:
+    """One consistent state of the snapshot; readers work on a view, never on the live object.
+
+    Column arrays may have spare capacity past ``n``, which later appends
+    fill in place. A view only ever looks at its first ``n`` rows, so those
+    writes are invisible to it.
+    """
+
+    def __init__(self, n, ids, years, ratings, genres, genre_names, genre_codes, titles, directors, orders):
+        self.n = n
+        self.ids = ids
+        self.years = years
+        self.ratings = ratings
+        self.genres = genres
+        self.genre_names = genre_names
+        self.genre_codes = genre_codes
+        self.titles = titles
+        self.directors = directors
+        # sort column -> (row indexes ordered by (key, id), keys in that order)
+        self.orders = orders
+
+
+class MovieSnapshot:
+    """Columnar in-memory copy of the movies table for serving GET /movies/.
+
+    Rows are held in id order in NumPy arrays, genres dictionary-encoded as
+    small ints, and filters are answered with vectorized masks. Writes made
+    through this process call ``sync()``, which appends rows with a higher
+    id than any seen so far; rows changed or deleted by other means need a
+    ``load()`` (or a restart) to show up.
+    """
+
+    def __init__(self, connect, initial_capacity=1024):
+        if np is None:
+            raise RuntimeError("The in-memory snapshot needs numpy (pip install numpy)")
+        self.connect = connect
+        self.initial_capacity = initial_capacity
+        self._conn = None
+        self._lock = threading.Lock()
+        self._view = None
+
+    def load(self):
+        """(Re)build the snapshot from scratch."""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self.connect()
+            self._view = _View(
+                0, np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int8), np.empty(0, np.int32),
+                [], {}, [], [], {},
+            )
+            self._append(self._fetch_after(0))
+
+    def sync(self):
+        """Pick up rows inserted since the last load or sync."""
+        with self._lock:
+            if self._view is None:
+                return
+            view = self._view
+            last_id = int(view.ids[view.n - 1]) if view.n else 0
+            self._append(self._fetch_after(last_id))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _fetch_after(self, last_id):
+        return self._conn.execute(
+            "SELECT id, title, director, year, genre, rating FROM movies WHERE id > ? ORDER BY id",
+            (last_id,),
+        ).fetchall()
+
+    def _genre_code(self, view, genre):
+        if genre is None:
+            return NO_GENRE
+        code = view.genre_codes.get(genre)
+        if code is None:
+            code = view.genre_codes[genre] = len(view.genre_names)
+            view.genre_names.append(genre)
+        return code
+
+    def _append(self, rows):
+        if not rows:
+            return
+        view = self._view
+        n, k = view.n, len(rows)
+        ids, years, ratings, genres = view.ids, view.years, view.ratings, view.genres
+        if n + k > len(ids):
+            # Grow geometrically so appends are amortized O(1) per row
+            capacity = max(self.initial_capacity, 2 * len(ids), n + k)
+            ids, years, ratings, genres = (_grow(column, n, capacity) for column in (ids, years, ratings, genres))
+
+        ids[n:n + k] = [row[0] for row in rows]
+        years[n:n + k] = [NULL_YEAR if row[3] is None else row[3] for row in rows]
+        ratings[n:n + k] = [NULL_RATING if row[5] is None else row[5] for row in rows]
+        genres[n:n + k] = [self._genre_code(view, row[4]) for row in rows]
+        view.titles.extend(row[1] for row in rows)
+        view.directors.extend(row[2] for row in rows)
+
+        # New ids are larger than every existing one, so each new row goes
+        # right after the existing rows with an equal or smaller key
+        orders = {}
+        for column, (order, keys) in list(view.orders.items()):
+            new_keys = {"year": years, "rating": ratings}[column][n:n + k]
+            new_order = np.argsort(new_keys, kind="stable")
+            positions = np.searchsorted(keys, new_keys[new_order], side="right")
+            orders[column] = (
+                np.insert(order, positions, new_order + n),
+                np.insert(keys, positions, new_keys[new_order]),
+            )
+        self._view = _View(
+            n + k, ids, years, ratings, genres, view.genre_names, view.genre_codes,
+            view.titles, view.directors, orders,
+        )
+
+    def _order(self, view, sort):
+        entry = view.orders.get(sort)
+        if entry is None:
+            keys = (view.years if sort == "year" else view.ratings)[:view.n]
+            order = np.argsort(keys, kind="stable")
+            entry = view.orders[sort] = (order, keys[order])
+        return entry[0]
+
+    def query(self, genre=None, min_rating=None, year_from=None, year_to=None,
+              limit=None, offset=0, sort="id", order="asc", after=None):
+        """Return one page of movies as dicts, mirroring GET /movies/ over SQLite.
+
+        ``after`` is the decoded keyset cursor, a (sort key, id) pair.
+        """
+        view = self._view
+        if view is None:
+            raise RuntimeError("Snapshot has not been loaded")
+        n = view.n
+        ids, years, ratings = view.ids[:n], view.years[:n], view.ratings[:n]
+
+        mask = np.ones(n, dtype=bool)
+        if genre is not None:
+            code = view.genre_codes.get(genre)
+            if code is None:
+                return []
+            mask &= view.genres[:n] == code
+        if min_rating is not None:
+            mask &= ratings >= min_rating
+        if year_from is not None:
+            mask &= years >= year_from
+        if year_to is not None:
+            mask &= (years <= year_to) & (years != NULL_YEAR)
+
+        descending = order == "desc"
+        if after is not None:
+            key, last_id = after
+            id_after = ids < last_id if descending else ids > last_id
+            if sort == "id":
+                mask &= id_after
+            else:
+                # A NULL key never compares, exactly like SQL row values
+                keys, null = (years, NULL_YEAR) if sort == "year" else (ratings, NULL_RATING)
+                key_after = keys < key if descending else keys > key
+                mask &= (keys != null) & (key_after | ((keys == key) & id_after))
+
+        if sort == "id":
+            selected = np.flatnonzero(mask)
+            if descending:
+                selected = selected[::-1]
+        else:
+            ordered = self._order(view, sort)
+            if descending:
+                ordered = ordered[::-1]
+            selected = _select(ordered, mask, None if limit is None else offset + limit)
+        selected = selected[offset:] if limit is None else selected[offset:offset + limit]
+
+        names = view.genre_names
+        return [
+            {
+                "title": view.titles[i],
+                "director": view.directors[i],
+                "year": None if year == NULL_YEAR else year,
+                "genre": None if code == NO_GENRE else names[code],
+                "rating": None if rating == NULL_RATING else rating,
+                "id": movie_id,
+            }
+            for i, movie_id, year, code, rating in zip(
+                selected.tolist(),
+                view.ids[selected].tolist(),
+                view.years[selected].tolist(),
+                view.genres[selected].tolist(),
+                view.ratings[selected].tolist(),
+            )
+        ]
+
+
+def _select(ordered, mask, stop, block=65536):
+    """Rows of ``ordered`` that pass ``mask``, stopping once ``stop`` are found."""
+    if stop is None or len(ordered) <= block:
+        return ordered[mask[ordered]]
+    found = []
+    count = 0
+    for start in range(0, len(ordered), block):
+        chunk = ordered[start:start + block]
+        chunk = chunk[mask[chunk]]
+        found.append(chunk)
+        count += len(chunk)
+        if count >= stop:
+            break
+    return np.concatenate(found)
+
+
+def _grow(column, n, capacity):
+    grown = np.empty(capacity, dtype=column.dtype)
+    grown[:n] = column[:n]
+    return grown
@@ -0,0 +1,49 @@
+import sqlite3
+import threading
+
+import database
+
+
+def _connect(path):
+    return sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+
+def test_concurrent_migrate_applies_each_step_once(tmp_path):
+    path = tmp_path / "movies.db"
+    conns = [_connect(path) for _ in range(2)]
+    barrier = threading.Barrier(len(conns))
+    ran, errors = [], []
+
+    def worker(conn):
+        barrier.wait()
+        try:
+            ran.extend(database.migrate(conn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(conn,)) for conn in conns]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(ran) == [version for version, _, _, _ in database.MIGRATIONS]
+    versions = [row[0] for row in conns[0].execute("SELECT version FROM schema_version ORDER BY version")]
+    assert versions == sorted(ran)
+    for conn in conns:
+        conn.close()
+
+
+def test_migrate_skips_steps_applied_by_another_connection(tmp_path):
+    path = tmp_path / "movies.db"
+    first, second = _connect(path), _connect(path)
+    assert database.current_version(second) == 0
+
+    assert database.migrate(first) == [version for version, _, _, _ in database.MIGRATIONS]
+    assert database.migrate(second) == []
+    assert database.migrate(second, 2) == list(range(database.LATEST_VERSION, 2, -1))
+    assert database.migrate(first, 2) == []
+    assert database.current_version(first) == 2
+    first.close()
+    second.close()